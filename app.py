@@ -4,6 +4,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.ensemble import RandomForestRegressor
 
+from src.resample import resample_series, GAP_LIMIT
+
 st.title("AQI Forecasting Dashboard")
 
 # ---------- CONFIG ----------
@@ -11,6 +13,7 @@ st.title("AQI Forecasting Dashboard")
 DATA_PATH = r"C:\Users\Chetna Negi\OneDrive\Desktop\AQI_Forecasting\data\processed\merged_output_final.csv"
 POLLUTANTS = ["pm25", "pm10", "o3", "no2", "so2", "co"]
 N_LAGS = 7  # how many past days to use as features
+GAP_LIMIT_DAYS = GAP_LIMIT  # longer gaps are left empty instead of filled
 
 
 # ---------- DATA LOADING & CLEANING ----------
@@ -44,6 +47,14 @@ def load_data(path):
     return df
 
 
+@st.cache_data
+def load_daily_series(path, center, pollutant, gap_limit):
+    """One center/pollutant aligned to a daily grid (short gaps interpolated)."""
+    df = load_data(path)
+    rows = df[df["center"] == center]
+    return resample_series(rows.set_index("date")[pollutant], freq="D", limit=gap_limit)
+
+
 try:
     df = load_data(DATA_PATH)
     st.success(f"Data loaded. Shape: {df.shape}")
@@ -107,11 +118,9 @@ if len(df_center) < (N_LAGS + 10):
 
 # ---------- FORECAST FUNCTION ----------
 def make_forecast(series: pd.Series, horizon: int, n_lags: int = 7):
-    # Ensure date index, regular daily frequency, forward fill
+    # series is on a regular daily grid (see load_daily_series); days in
+    # gaps longer than GAP_LIMIT_DAYS are NaN, so lags touching them drop out
     series = series.sort_index()
-    full_index = pd.date_range(start=series.index.min(), end=series.index.max(), freq="D")
-    series = series.reindex(full_index)
-    series = series.ffill()
 
     # Build lag features
     df_ts = pd.DataFrame({"y": series})
@@ -133,10 +142,16 @@ def make_forecast(series: pd.Series, horizon: int, n_lags: int = 7):
     )
     model.fit(X, y)
 
-    history = list(series.dropna())
-    last_lags = history[-n_lags:]
-    preds = []
     last_date = series.index.max()
+    last_lags = list(series.iloc[-n_lags:])
+    if np.isnan(last_lags).any():
+        missing = series.iloc[-n_lags:]
+        missing = missing[missing.isna()].index
+        raise ValueError(
+            f"No data from {missing.min().date()} to {missing.max().date()} (a gap longer than "
+            f"{GAP_LIMIT_DAYS} days) within the last {n_lags} days before {last_date.date()}."
+        )
+    preds = []
 
     for _ in range(horizon):
         x_input = np.array(last_lags[-n_lags:]).reshape(1, -1)
@@ -169,7 +184,10 @@ st.pyplot(hist_fig)
 st.markdown("### Forecast")
 
 try:
-    series = df_center.set_index("date")[selected_pollutant]
+    series = load_daily_series(DATA_PATH, selected_center, selected_pollutant, GAP_LIMIT_DAYS)
+    series = series[pd.to_datetime(start_date):pd.to_datetime(end_date)]
+    # a range edge inside a gap is not a gap in the data we forecast from
+    series = series.loc[series.first_valid_index():series.last_valid_index()]
     forecast_series = make_forecast(series, horizon=forecast_horizon, n_lags=N_LAGS)
 
     tail_days = max(60, forecast_horizon * 2)
@@ -2,10 +2,11 @@
 import os
 import pandas as pd
 from src.centers import CENTERS
+from src.resample import load_resampled, FREQ
 
 IN = os.path.join("data", "processed_data.csv")
 OUT_DIR = os.path.join("data", "history")
-N = 24  # last N rows (hours)
+N = 24  # last N periods of the FREQ grid
 
 def normalize_text(s):
     return str(s).strip().lower()
@@ -25,14 +26,11 @@ def main():
     if not os.path.exists(IN):
         raise FileNotFoundError(f"Input file not found: {IN}")
 
-    df = pd.read_csv(IN)
-    # ensure timestamp is datetime and sorted
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-        df = df.dropna(subset=["timestamp"]).sort_values("timestamp")
-    else:
+    if "timestamp" not in pd.read_csv(IN, nrows=0).columns:
         print("Warning: 'timestamp' column not found - cannot create history files.")
         return
+    # each center aligned to the FREQ grid (shared cache with training)
+    df = load_resampled(IN)
 
     os.makedirs(OUT_DIR, exist_ok=True)
 
@@ -50,10 +48,11 @@ def main():
         for c in ["pm10","o3","no2","so2","co"]:
             if c in rows.columns:
                 keep_cols.append(c)
-        rows = rows[keep_cols].dropna(subset=["timestamp"])
+        # several stations can match one center key: average them per period
+        rows = rows[keep_cols].groupby("timestamp").mean().reset_index()
 
-        # take last N rows
-        last = rows.tail(N)
+        # take last N periods (grid rows, so lags in rows are lags in time)
+        last = rows.set_index("timestamp").asfreq(FREQ).tail(N).reset_index()
         if last.empty:
             skipped.append(center_key)
             continue
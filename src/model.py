@@ -3,12 +3,28 @@ import joblib
 import os
 import pandas as pd
 
-# -------- LOAD MODEL & SCALER --------
-def load_model():
-    model_path = os.path.join("src", "models", "model.pkl")
-    scaler_path = os.path.join("src", "models", "scaler.pkl")
+# set AQI_SHARED_MODEL=1 in worker processes to attach to the memory-mapped
+# forest exported by `python -m src.shared_model export` instead of each
+# worker unpickling its own copy
+SHARED_MODEL = os.environ.get("AQI_SHARED_MODEL") == "1"
+# set AQI_CHUNKED_MODEL=1 to serve the model written by
+# `python -m src.train_model --chunked` (not a forest, so never shared)
+CHUNKED_MODEL = os.environ.get("AQI_CHUNKED_MODEL") == "1"
+
 
-    model = joblib.load(model_path)
+# -------- LOAD MODEL & SCALER --------
+def load_model(shared=SHARED_MODEL, chunked=CHUNKED_MODEL):
+    suffix = "_chunked" if chunked else ""
+    model_path = os.path.join("src", "models", f"model{suffix}.pkl")
+    scaler_path = os.path.join("src", "models", f"scaler{suffix}.pkl")
+
+    if shared and chunked:
+        raise ValueError("Shared mode only applies to the forest, not the chunked model")
+    if shared:
+        from src.shared_model import SharedForest
+        model = SharedForest.attach(model_path=model_path)
+    else:
+        model = joblib.load(model_path)
 
     # scaler is optional
     if os.path.exists(scaler_path):
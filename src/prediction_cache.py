@@ -0,0 +1,90 @@
+# src/prediction_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MODEL_FILES = [os.path.join("src", "models", name)
+               for name in ["model.pkl", "scaler.pkl", "model_chunked.pkl", "scaler_chunked.pkl"]]
+CACHE_SIZE = 256      # max cached predictions (LRU beyond this)
+CACHE_TTL = 15 * 60   # seconds; roughly one OpenWeatherMap update window
+DECIMALS = 2          # features are rounded to this before hashing
+
+
+def file_version(paths):
+    """Cheap version tag for a set of files: hash of (path, size, mtime).
+    Changes whenever one of them is rewritten (e.g. a new model is trained)."""
+    h = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode())
+        else:
+            h.update(f"{path}:missing;".encode())
+    return h.hexdigest()[:16]
+
+
+def feature_hash(X, decimals=DECIMALS):
+    """Hash of the feature row(s), quantized so float noise doesn't miss the cache."""
+    values = np.round(np.asarray(X, dtype=np.float64), decimals)
+    h = hashlib.sha1(",".join(map(str, getattr(X, "columns", []))).encode())
+    h.update(values.tobytes())
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]  # expired
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set_version(self, version):
+        """Record the model version; entries are dropped when it changes.
+        Check and clear happen under the lock, so concurrent callers can't
+        interleave them."""
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+            }
@@ -3,6 +3,10 @@ from src.realtime import get_realtime_aqi_by_coords, format_for_model
 from src.preprocess import make_realtime_features
 from src.model import predict_pm2_5
 from src.centers import CENTERS
+from src.prediction_cache import PredictionCache, MODEL_FILES, file_version, feature_hash
+
+# predictions keyed by (model version, history version, center, feature row)
+_cache = PredictionCache()
 
 
 def predict_for_center(center_name):
@@ -12,6 +16,8 @@ def predict_for_center(center_name):
     - Center coordinates from centers.py
     - Realtime API data
     - Center-specific history file
+    Repeated calls with the same (quantized) feature row are served from
+    the prediction cache until its TTL expires or the model/history changes.
     """
 
     if center_name not in CENTERS:
@@ -31,7 +37,19 @@ def predict_for_center(center_name):
     # 3. Build ML features
     X = make_realtime_features(rt, hist)
 
-    # 4. Predict
-    pred = predict_pm2_5(X)
+    # 4. Predict (cached)
+    version = file_version(MODEL_FILES)
+    _cache.set_version(version)  # a new model was trained: drop stale predictions
+    key = (version, file_version([history_path]), center_name, feature_hash(X))
+
+    pred = _cache.get(key)
+    if pred is None:
+        pred = predict_pm2_5(X)
+        _cache.put(key, pred)
 
     return pred
+
+
+def cache_stats():
+    """Hit/miss counts and hit rate of the prediction cache."""
+    return _cache.stats()
@@ -1,15 +1,49 @@
 # src/preprocess.py
+import logging
 import pandas as pd
 
-def make_features(df, target="pm2_5", lags=[1,3,6,12,24]):
+from src.resample import FREQ
+
+logger = logging.getLogger(__name__)
+
+# feature columns (and order) expected by the model at prediction time
+FEATURES = [
+    "pm2_5", "pm10", "o3", "no2", "so2", "co",
+    "hour", "dow",
+    "pm2_5_lag_1", "pm2_5_lag_3", "pm2_5_lag_6",
+    "pm2_5_lag_12", "pm2_5_lag_24"
+]
+
+def shift_by_time(df, col, periods, freq, by="center"):
+    """
+    Value of `col` exactly `periods` * freq earlier (later if negative) for
+    each row, looked up by timestamp within the same `by` group.
+    NaN when no row exists at that time.
+    """
+    offset = periods * pd.tseries.frequencies.to_offset(freq)
+    if by in df.columns:
+        index = pd.MultiIndex.from_arrays([df[by], df["timestamp"]])
+        lookup = pd.MultiIndex.from_arrays([df[by], df["timestamp"] - offset])
+    else:
+        index = pd.DatetimeIndex(df["timestamp"])
+        lookup = pd.DatetimeIndex(df["timestamp"] - offset)
+    values = pd.Series(df[col].to_numpy(), index=index)
+    values = values[~values.index.duplicated(keep="last")]
+    return values.reindex(lookup).to_numpy()
+
+
+def make_features(df, target="pm2_5", lags=[1,3,6,12,24], freq=None):
     """
     Minimal feature creation for training:
     - ensures timestamp, sorts
     - creates hour, dow, and simple lag features for the target
+    If `freq` is given, lag N means N * freq earlier in time (per center)
+    instead of N rows earlier.
     """
     df = df.copy()
     df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df = df.sort_values("timestamp").reset_index(drop=True)
+    sort_cols = ["center", "timestamp"] if freq and "center" in df.columns else "timestamp"
+    df = df.sort_values(sort_cols).reset_index(drop=True)
 
     # time features
     df["hour"] = df["timestamp"].dt.hour
@@ -17,7 +51,10 @@ def make_features(df, target="pm2_5", lags=[1,3,6,12,24]):
 
     # lag features for target (if target missing in some rows, result will have NaNs)
     for lag in lags:
-        df[f"{target}_lag_{lag}"] = df[target].shift(lag)
+        if freq:
+            df[f"{target}_lag_{lag}"] = shift_by_time(df, target, lag, freq)
+        else:
+            df[f"{target}_lag_{lag}"] = df[target].shift(lag)
 
     # drop rows that don't have the basic lag features
     required = [f"{target}_lag_{lag}" for lag in lags]
@@ -26,20 +63,29 @@ def make_features(df, target="pm2_5", lags=[1,3,6,12,24]):
     return df
 
 
-def add_target(df, target="pm2_5", horizon=24):
+def add_target(df, target="pm2_5", horizon=24, freq=None):
     """
-    Adds a future target column named '<target>_future' shifted by -horizon.
+    Adds a future target column named '<target>_future' shifted by -horizon
+    (rows, or horizon * freq in time if `freq` is given).
     Drops rows without the future target.
     """
     df = df.copy()
-    df[f"{target}_future"] = df[target].shift(-horizon)
+    if freq:
+        df[f"{target}_future"] = shift_by_time(df, target, -horizon, freq)
+    else:
+        df[f"{target}_future"] = df[target].shift(-horizon)
     df = df.dropna(subset=[f"{target}_future"]).reset_index(drop=True)
     return df
-def make_realtime_features(rt_row, history_df, target="pm2_5"):
+def make_realtime_features(rt_row, history_df, target="pm2_5", freq=FREQ):
     """
     Build real-time features using:
-    - current realtime row
-    - last 24 rows of history_df
+    - current realtime row (its timestamp floored to the `freq` grid)
+    - history_df on the same grid
+    Lags are looked up by time like in training. If the history ends more
+    than one period before the realtime row (nothing refreshes the history
+    files), a warning is logged and the history is treated as if it ended
+    just before the realtime row, i.e. its most recent values are used as
+    lags instead of leaving every lag NaN.
     Returns a row with same feature columns as training.
     """
     import pandas as pd
@@ -62,8 +108,25 @@ def make_realtime_features(rt_row, history_df, target="pm2_5"):
     except:
         pass
 
-    # Combine history + realtime
-    full = pd.concat([hist, rt], ignore_index=True).sort_values("timestamp").reset_index(drop=True)
+    # Align the realtime row to the history/training grid
+    rt["timestamp"] = rt["timestamp"].dt.floor(freq)
+
+    # Stale history: shift it so its last valid period precedes the realtime row
+    step = pd.tseries.frequencies.to_offset(freq)
+    now = rt["timestamp"].max()
+    hist_end = hist.loc[hist[target].notna(), "timestamp"].max() if target in hist.columns else pd.NaT
+    if pd.notna(hist_end) and pd.notna(now) and hist_end < now - step:
+        logger.warning(
+            "History ends %s, %d periods before the realtime row (%s); "
+            "using its most recent values as lags.",
+            hist_end.date(), len(pd.date_range(hist_end, now, freq=freq)) - 1, now.date(),
+        )
+        hist["timestamp"] = hist["timestamp"] + ((now - step) - hist_end)
+
+    # Combine history + realtime (stable sort keeps the realtime row last
+    # if history already has a row for the current period)
+    full = pd.concat([hist, rt], ignore_index=True)
+    full = full.sort_values("timestamp", kind="stable").reset_index(drop=True)
 
     # Time features
     full["hour"] = full["timestamp"].dt.hour
@@ -71,18 +134,11 @@ def make_realtime_features(rt_row, history_df, target="pm2_5"):
 
     # Lag features
     for lag in [1, 3, 6, 12, 24]:
-        full[f"{target}_lag_{lag}"] = full[target].shift(lag)
+        full[f"{target}_lag_{lag}"] = shift_by_time(full, target, lag, freq)
 
     # Final row = realtime row
     X = full.tail(1)
 
-    FEATURES = [
-        "pm2_5", "pm10", "o3", "no2", "so2", "co",
-        "hour", "dow",
-        "pm2_5_lag_1", "pm2_5_lag_3", "pm2_5_lag_6",
-        "pm2_5_lag_12", "pm2_5_lag_24"
-    ]
-
     # Only keep features present
     X = X[[f for f in FEATURES if f in X.columns]]
 
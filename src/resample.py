@@ -0,0 +1,114 @@
+# src/resample.py
+import hashlib
+import os
+import pandas as pd
+
+IN = os.path.join("data", "processed_data.csv")
+CACHE_DIR = os.path.join("data", "cache")
+FREQ = "D"       # fixed grid every center is aligned to
+GAP_LIMIT = 3    # longest gap (in periods) filled by interpolation
+VALUE_COLS = ["pm2_5", "pm10", "o3", "no2", "so2", "co"]
+# bump whenever the resampling output changes, so old on-disk caches are ignored
+RESAMPLE_VERSION = 1
+
+_memo = {}  # in-process cache: (path, mtime, freq, limit) -> resampled frame
+
+
+def fill_gaps(s, limit=GAP_LIMIT):
+    """
+    Interpolate (by time) gaps of at most `limit` consecutive periods.
+    Longer gaps, and gaps at the start/end of the series, stay NaN.
+    Returns (filled series, boolean mask of imputed values).
+    """
+    na = s.isna()
+    # every NaN run shares the id of the valid value just before it
+    run_len = na.groupby((~na).cumsum()).transform("sum")
+    short = na & (run_len <= limit)
+    filled = s.interpolate(method="time", limit_area="inside")
+    filled = filled.where(~na | short)
+    return filled, short & filled.notna()
+
+
+def resample_series(s, freq=FREQ, limit=GAP_LIMIT):
+    """
+    Align a datetime-indexed series to a fixed `freq` grid, spanning its
+    first to last valid value. Duplicate/sub-period values are averaged;
+    short gaps are interpolated.
+    """
+    s = pd.to_numeric(s, errors="coerce")
+    s = s[s.index.notna()].dropna().sort_index().resample(freq).mean()
+    filled, _ = fill_gaps(s, limit)
+    return filled
+
+
+def resample_center(df, freq=FREQ, limit=GAP_LIMIT, target="pm2_5", value_cols=VALUE_COLS):
+    """
+    Resample one center's rows to a fixed grid.
+    Adds two masks:
+    - imputed: at least one value in the row was interpolated
+    - gap: target is missing because the gap was longer than `limit`
+    """
+    cols = [c for c in value_cols if c in df.columns]
+    ts = pd.to_datetime(df["timestamp"], errors="coerce")
+    values = df[cols].apply(pd.to_numeric, errors="coerce").set_index(ts)
+    values = values[values.index.notna()].sort_index().resample(freq).mean()
+
+    out = pd.DataFrame(index=values.index)
+    imputed = pd.Series(False, index=values.index)
+    for c in cols:
+        out[c], mask = fill_gaps(values[c], limit)
+        imputed |= mask
+    out["imputed"] = imputed
+    out["gap"] = out[target].isna() if target in out.columns else True
+
+    return out.rename_axis("timestamp").reset_index()
+
+
+def resample_frame(df, freq=FREQ, limit=GAP_LIMIT, target="pm2_5", group_col="center"):
+    """Resample every center in `df` (or the whole frame if it has no `group_col`)."""
+    if group_col not in df.columns:
+        return resample_center(df, freq, limit, target)
+
+    parts = []
+    for center, rows in df.groupby(group_col, sort=False):
+        part = resample_center(rows, freq, limit, target)
+        part[group_col] = center
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=["timestamp", group_col])
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_resampled(path=IN, freq=FREQ, limit=GAP_LIMIT):
+    """
+    Resampled version of `path`, computed once and cached in memory and on
+    disk (data/cache/). The cache file is specific to the source's absolute
+    path and RESAMPLE_VERSION, and is rebuilt when the source file changes.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input file not found: {path}")
+
+    mtime = os.path.getmtime(path)
+    key = (os.path.abspath(path), mtime, freq, limit)
+    if key in _memo:
+        return _memo[key].copy()
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:10]
+    cache_path = os.path.join(
+        CACHE_DIR, f"{name}_{path_hash}_{freq}_{limit}_v{RESAMPLE_VERSION}.pkl")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= mtime:
+        df = pd.read_pickle(cache_path)
+    else:
+        df = resample_frame(pd.read_csv(path), freq, limit)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_pickle(cache_path)
+
+    _memo[key] = df
+    return df.copy()
+
+
+if __name__ == "__main__":
+    df = load_resampled()
+    print(f"Resampled to '{FREQ}' (gap limit {GAP_LIMIT}): {len(df)} rows")
+    print(df.groupby("center")[["imputed", "gap"]].sum().to_string())
@@ -0,0 +1,217 @@
+# src/shared_model.py
+"""
+Serve one copy of the forest to many worker processes.
+
+`export_forest` (run once, by a single loader process) flattens the trees of
+the trained RandomForest into plain numpy arrays under src/models/shared/.
+Each export goes to its own versioned directory; the CURRENT file names
+the active one and is swapped atomically.
+Workers `SharedForest.attach()` to those files with np.load(mmap_mode="r"):
+the arrays are never copied into the process, the OS page cache holds a
+single copy, so N workers cost roughly one model's memory.
+"""
+import logging
+import os
+import shutil
+import sys
+import time
+import numpy as np
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.path.join("src", "models", "model.pkl")
+SHARED_DIR = os.path.join("src", "models", "shared")
+ARRAYS = ["roots", "left", "right", "feature", "threshold", "value", "missing_left"]
+TREE_LEAF = -1
+POINTER = "CURRENT"  # file in SHARED_DIR naming the active version directory
+
+
+def export_forest(model=None, out_dir=SHARED_DIR, model_path=MODEL_PATH):
+    """
+    Flatten a fitted forest (RandomForestRegressor or similar) into
+    concatenated node arrays, one .npy file each. Child indices are global,
+    so all trees live in the same arrays; roots[i] is tree i's first node.
+
+    Arrays are written to a new version directory, then the CURRENT pointer
+    is replaced atomically, so a concurrent attach() sees either the old or
+    the new export, never a partial or missing one. The previous version is
+    kept for workers that read the old pointer just before the swap; older
+    ones are removed. On Linux that is safe even while workers still map
+    them. Elsewhere (e.g. Windows) a mapped file can't be deleted; such
+    directories are skipped with a warning and retried on the next export.
+    """
+    if model is None:
+        model = joblib.load(model_path)
+    if not hasattr(model, "estimators_"):
+        raise ValueError(f"Only tree ensembles can be shared, got {type(model).__name__}")
+
+    parts = {name: [] for name in ARRAYS[1:]}
+    roots = []
+    offset = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output forests are supported")
+        roots.append(offset)
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        parts["left"].append(np.where(left == TREE_LEAF, TREE_LEAF, left + offset))
+        parts["right"].append(np.where(right == TREE_LEAF, TREE_LEAF, right + offset))
+        parts["feature"].append(tree.feature.astype(np.int64))
+        parts["threshold"].append(tree.threshold)
+        parts["value"].append(tree.value[:, 0, 0])
+        # which side NaNs go to (only set on trees fitted with missing values)
+        missing = getattr(tree, "missing_go_to_left", None)
+        if missing is None:
+            missing = np.zeros(tree.node_count, dtype=np.uint8)
+        parts["missing_left"].append(missing.astype(bool))
+        offset += tree.node_count
+
+    os.makedirs(out_dir, exist_ok=True)
+    previous = _current_version(out_dir)
+    version = f"v{time.time_ns()}"
+    version_dir = os.path.join(out_dir, version)
+    os.makedirs(version_dir)
+    np.save(os.path.join(version_dir, "roots.npy"), np.array(roots, dtype=np.int64))
+    for name, arrs in parts.items():
+        np.save(os.path.join(version_dir, f"{name}.npy"), np.concatenate(arrs))
+
+    tmp_pointer = os.path.join(out_dir, POINTER + ".tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(out_dir, POINTER))
+
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if os.path.isdir(path) and name not in (version, previous):
+            try:
+                shutil.rmtree(path)
+            except OSError as e:
+                logger.warning("Could not remove old shared model %s (still in use?): %s", path, e)
+    return version_dir
+
+
+def _current_version(shared_dir):
+    """Name of the active version directory, or None if nothing was exported."""
+    try:
+        with open(os.path.join(shared_dir, POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class SharedForest:
+    """Read-only forest backed by memory-mapped node arrays."""
+
+    def __init__(self, arrays):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def attach(cls, shared_dir=SHARED_DIR, model_path=MODEL_PATH):
+        version = _current_version(shared_dir)
+        if version is None:
+            raise FileNotFoundError(
+                f"No shared model in {shared_dir}. Run: python -m src.shared_model export")
+        if os.path.exists(model_path) and \
+                os.path.getmtime(model_path) > os.path.getmtime(os.path.join(shared_dir, POINTER)):
+            raise RuntimeError(
+                f"{shared_dir} is older than {model_path}. Run: python -m src.shared_model export")
+        version_dir = os.path.join(shared_dir, version)
+        arrays = {name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+                  for name in ARRAYS}
+        return cls(arrays)
+
+    def predict(self, X):
+        """Mean leaf value over all trees, traversing every tree at once."""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[None, :]
+        node = np.repeat(np.asarray(self.roots)[:, None], X.shape[0], axis=1)
+
+        while True:
+            left = self.left[node]
+            leaf = left == TREE_LEAF
+            if leaf.all():
+                break
+            x = X[rows, self.feature[node]]  # leaves have feature -2; masked below
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(leaf, node, np.where(go_left, left, self.right[node]))
+
+        return self.value[node].mean(axis=0)
+
+
+# -------- MEMORY BENCHMARK --------
+def _memory_kb(pid):
+    """(RSS, PSS) of a process in kB. PSS splits shared pages between the
+    processes mapping them, so summing it gives the real aggregate cost."""
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def _bench_worker(shared, model_path, shared_dir, n_features, ready, done):
+    if shared:
+        model = SharedForest.attach(shared_dir, model_path)
+    else:
+        model = joblib.load(model_path)
+    # touch every tree so all node pages are actually mapped in
+    model.predict(np.random.default_rng(0).random((256, n_features)))
+    ready.set()
+    done.wait()
+
+
+def benchmark(worker_counts=(1, 4, 8), model_path=MODEL_PATH, shared_dir=SHARED_DIR,
+              timeout=300):
+    """
+    Aggregate RSS/PSS (MB) of N workers holding the model, private vs shared.
+    Returns {(mode, n_workers): (rss_mb, pss_mb)} with mode "private" or "shared".
+    """
+    import multiprocessing as mp
+
+    n_features = joblib.load(model_path).n_features_in_
+    ctx = mp.get_context("spawn")
+    results = {}
+    for mode in ("private", "shared"):
+        for n in worker_counts:
+            done = ctx.Event()
+            readies = [ctx.Event() for _ in range(n)]
+            procs = [ctx.Process(target=_bench_worker,
+                                 args=(mode == "shared", model_path, shared_dir, n_features, r, done))
+                     for r in readies]
+            for p in procs:
+                p.start()
+            try:
+                deadline = time.monotonic() + timeout
+                for p, r in zip(procs, readies):
+                    while not r.wait(1):
+                        if p.exitcode is not None or time.monotonic() > deadline:
+                            raise RuntimeError(f"{mode} worker failed to load the model")
+                usage = [_memory_kb(p.pid) for p in procs]
+            finally:
+                done.set()
+                for p in procs:
+                    p.join(timeout)
+                    if p.is_alive():
+                        p.terminate()
+            results[(mode, n)] = (sum(u[0] for u in usage) / 1024,
+                                  sum(u[1] for u in usage) / 1024)
+    return results
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if cmd == "export":
+        print("Exported forest arrays to:", export_forest())
+    elif cmd == "bench":
+        print(f"{'mode':<8}{'workers':>8}{'sum RSS MB':>12}{'sum PSS MB':>12}")
+        for (mode, n), (rss, pss) in benchmark().items():
+            print(f"{mode:<8}{n:>8}{rss:>12.1f}{pss:>12.1f}")
+    else:
+        print("usage: python -m src.shared_model [export|bench]")
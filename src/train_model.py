@@ -1,19 +1,50 @@
 # src/train_model.py
+import argparse
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import os
+import shutil
 
-from src.preprocess import make_features, add_target
+from src.preprocess import make_features, add_target, FEATURES
+from src.shared_model import export_forest
+from src.resample import load_resampled, resample_frame, FREQ, GAP_LIMIT
+
+DATA_PATH = os.path.join("data", "processed_data.csv")
+LAGS = [1, 3, 6, 12, 24]
+HORIZON = 24  # periods of FREQ ahead (24 days with FREQ="D"); lags are in FREQ periods too
+CHUNK_SIZE = 50_000  # rows read from the CSV at a time in chunked mode
+PARTITION_DIR = os.path.join("data", "partitions")
+EPOCHS = 5  # passes over the data in chunked mode
+CHUNKED_MODEL_PATH = os.path.join("src", "models", "model_chunked.pkl")
+CHUNKED_SCALER_PATH = os.path.join("src", "models", "scaler_chunked.pkl")
 
 
 def load_data():
-    path = os.path.join("data", "processed_data.csv")
+    path = DATA_PATH
     if not os.path.exists(path):
         raise FileNotFoundError(f"Expected training file not found: {path}")
-    return pd.read_csv(path)
+    # aligned to a fixed FREQ grid per center (cached, see src/resample.py)
+    return load_resampled(path)
+
+
+def holdout_mask(df, test_size=0.2, group_col="center"):
+    """
+    True for the last `test_size` fraction of rows (by timestamp) of each
+    center, so every station is scored on its most recent period.
+    """
+    if group_col not in df.columns:
+        order = df["timestamp"].rank(method="first") - 1
+        return order >= int(len(df) * (1 - test_size))
+    groups = df.groupby(group_col)["timestamp"]
+    order = groups.rank(method="first") - 1
+    n_train = (groups.transform("size") * (1 - test_size)).astype(int)
+    return order >= n_train
 
 
 def train_model():
@@ -21,12 +52,15 @@ def train_model():
     df = load_data()
 
     print("➡ Creating features...")
-    df = make_features(df, target="pm2_5")
-    df = add_target(df, target="pm2_5")
+    df = make_features(df, target="pm2_5", lags=LAGS, freq=FREQ)
+    df = add_target(df, target="pm2_5", horizon=HORIZON, freq=FREQ)
+    # current value falls in a gap too long to interpolate
+    df = df[~df["gap"]]
+    is_test = holdout_mask(df, test_size=0.2)
 
     # drop obvious non-feature columns
     df = df.copy()
-    drop_cols = ["timestamp", "station_id", "center"]
+    drop_cols = ["timestamp", "station_id", "center", "imputed", "gap"]
     for c in drop_cols:
         if c in df.columns:
             df = df.drop(columns=[c])
@@ -50,8 +84,9 @@ def train_model():
 
     print("Feature columns used for training:", numeric_cols)
 
-    # train/test split (time-aware: no shuffle)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, shuffle=False, test_size=0.2)
+    # train/test split (time-aware: last 20% of each center's timeline)
+    X_train, X_test = X[~is_test], X[is_test]
+    y_train, y_test = y[~is_test], y[is_test]
 
     # scale features
     scaler = StandardScaler()
@@ -70,11 +105,250 @@ def train_model():
     os.makedirs("src/models", exist_ok=True)
     joblib.dump(model, "src/models/model.pkl")
     joblib.dump(scaler, "src/models/scaler.pkl")
+    # flattened tree arrays for memory-mapped serving (AQI_SHARED_MODEL=1)
+    export_forest(model)
 
     print("🎉 Model saved successfully!")
     print("   → src/models/model.pkl")
     print("   → src/models/scaler.pkl")
+    print("   → src/models/shared/")
+
+
+# -------- CHUNKED (OUT-OF-CORE) TRAINING --------
+def partition_data(path=DATA_PATH, out_dir=PARTITION_DIR, chunksize=CHUNK_SIZE):
+    """
+    Stream the processed CSV once and split it into per-center, per-year
+    partition files (out_dir/<center>/<year>.csv). Each partition is small
+    enough to sort in memory, so the full file is never loaded at once.
+    Returns {center: [partition paths in time order]}.
+    """
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if "center" not in chunk.columns:
+            chunk["center"] = "all"
+        chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], errors="coerce")
+        chunk = chunk.dropna(subset=["timestamp"])
+
+        for (center, year), part in chunk.groupby(["center", chunk["timestamp"].dt.year]):
+            center_dir = os.path.join(out_dir, str(center))
+            os.makedirs(center_dir, exist_ok=True)
+            out_path = os.path.join(center_dir, f"{year}.csv")
+            part.to_csv(out_path, index=False, mode="a", header=not os.path.exists(out_path))
+
+    partitions = {}
+    for center in sorted(os.listdir(out_dir)):
+        center_dir = os.path.join(out_dir, center)
+        years = sorted(os.listdir(center_dir))
+        partitions[center] = [os.path.join(center_dir, y) for y in years]
+    return partitions
+
+
+def _iter_center_chunks(center, paths, target, lags, horizon, freq, limit):
+    """(center, X, y) chunks of one center's partitions, in time order."""
+    carry_span = (max(lags) + horizon + limit) * pd.tseries.frequencies.to_offset(freq)
+    carry = None
+    emitted_until = pd.Timestamp.min  # newest timestamp already yielded
+    for part_path in paths:
+        part = pd.read_csv(part_path, parse_dates=["timestamp"])
+        part = pd.concat([carry, part], ignore_index=True)
+        carry = part[part["timestamp"] > part["timestamp"].max() - carry_span]
+
+        grid = resample_frame(part, freq, limit, target)
+        feats = make_features(grid, target=target, lags=lags, freq=freq)
+        feats = add_target(feats, target=target, horizon=horizon, freq=freq)
+        feats = feats[feats["timestamp"] > emitted_until]
+        if feats.empty:
+            continue
+        emitted_until = feats["timestamp"].max()
+        feats = feats[~feats["gap"]]
+
+        X = feats.reindex(columns=FEATURES).apply(pd.to_numeric, errors="coerce")
+        yield center, X, feats[f"{target}_future"]
+
+
+def iter_feature_chunks(partitions, target="pm2_5", lags=LAGS, horizon=HORIZON,
+                        freq=FREQ, limit=GAP_LIMIT, interleave=False, rng=None):
+    """
+    Yield (center, X, y) feature chunks, one per center/year partition,
+    always in time order within each center. By default centers come one
+    after another; with `interleave` they take turns (in an `rng`-shuffled
+    order if given), so incremental training doesn't drift towards
+    whichever centers come last.
+
+    Each partition is resampled to the `freq` grid. Raw rows from the last
+    max(lags) + horizon (+ gap limit) periods are carried into the next
+    partition of the same center, so resampling, lag features and the future
+    target are correct across partition boundaries. Every grid row is
+    yielded at most once (tracked by its timestamp).
+    """
+    centers = list(partitions)
+    if rng is not None:
+        centers = [centers[k] for k in rng.permutation(len(centers))]
+    streams = [_iter_center_chunks(c, partitions[c], target, lags, horizon, freq, limit)
+               for c in centers]
+
+    if not interleave:
+        for stream in streams:
+            yield from stream
+        return
+
+    while streams:
+        for stream in list(streams):
+            try:
+                yield next(stream)
+            except StopIteration:
+                streams.remove(stream)
+
+
+def fit_scaler_streaming(chunks):
+    """
+    StandardScaler fitted from per-column count / sum / sum of squares
+    accumulated over `chunks`, skipping NaN. (StandardScaler.partial_fit
+    turns var_ into NaN for good after a chunk with an all-NaN column.)
+    Columns that are never observed get mean 0 and scale 1.
+    """
+    count = total = total_sq = 0
+    columns = None
+    for X in chunks:
+        values = X.to_numpy(dtype=np.float64)
+        observed = ~np.isnan(values)
+        count = count + observed.sum(axis=0)
+        total = total + np.where(observed, values, 0).sum(axis=0)
+        total_sq = total_sq + np.where(observed, values ** 2, 0).sum(axis=0)
+        columns = X.columns
+
+    if columns is None:
+        return None
+    safe = np.maximum(count, 1)
+    mean = np.where(count > 0, total / safe, 0.0)
+    var = np.where(count > 0, np.maximum(total_sq / safe - mean ** 2, 0.0), 1.0)
+
+    scaler = StandardScaler()
+    scaler.fit(np.zeros((2, len(columns))))  # sets the fitted attributes' shapes
+    scaler.feature_names_in_ = np.asarray(columns, dtype=object)
+    scaler.n_samples_seen_ = count.astype(np.int64)
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+    return scaler
+
+
+def _split_chunks(partitions, n_train, rng=None):
+    """
+    Interleaved feature chunks with a boolean holdout mask: rows past the
+    first n_train[center] rows of their center's timeline are test rows.
+    """
+    seen = {}  # center -> rows consumed so far
+    for center, X, y in iter_feature_chunks(partitions, interleave=True, rng=rng):
+        done = seen.get(center, 0)
+        seen[center] = done + len(y)
+        is_test = np.arange(done, done + len(y)) >= n_train[center]
+        yield center, X, y, is_test
+
+
+def train_model_chunked(path=DATA_PATH, chunksize=CHUNK_SIZE, test_size=0.2, epochs=EPOCHS):
+    """
+    Train an SGDRegressor incrementally over streamed chunks.
+
+    The CSV is first split into center/year partitions. Pass 1 fits the
+    scaler from streamed column sums and counts rows per center; pass 2
+    runs `epochs` passes of partial_fit with centers interleaved in a
+    shuffled order and rows shuffled within each chunk, skipping the last
+    `test_size` fraction of each center's timeline; pass 3 scores the final
+    model on that holdout.
+
+    Missing values are mean-imputed (0 after scaling) by an imputer step
+    saved with the model, so serving handles NaN the same way as training.
+    Saved to model_chunked.pkl / scaler_chunked.pkl; the forest in
+    model.pkl (and its shared export) is left untouched.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Expected training file not found: {path}")
+
+    print("➡ Partitioning data by center and year...")
+    partitions = partition_data(path, chunksize=chunksize)
+
+    print("➡ Pass 1: fitting scaler on chunks...")
+    n_rows = {}  # center -> feature rows
+
+    def count_rows():
+        for center, X, _ in iter_feature_chunks(partitions):
+            n_rows[center] = n_rows.get(center, 0) + len(X)
+            yield X
+
+    scaler = fit_scaler_streaming(count_rows())
+    if scaler is None:
+        print("ERROR: No rows left after feature creation; nothing to train on.")
+        return
+
+    n_train = {c: int(n * (1 - test_size)) for c, n in n_rows.items()}
+    total_train = sum(n_train.values())
+    print(f"Feature columns used for training: {FEATURES}")
+    print(f"Rows: {sum(n_rows.values())} ({total_train} train / "
+          f"{sum(n_rows.values()) - total_train} test)")
+
+    print(f"➡ Pass 2: training SGDRegressor incrementally ({epochs} epochs)...")
+    # after scaling, mean imputation is a constant 0
+    imputer = SimpleImputer(strategy="constant", fill_value=0.0, keep_empty_features=True)
+    imputer.fit(np.zeros((1, len(FEATURES))))
+    model = SGDRegressor(random_state=42)
+    rng = np.random.default_rng(42)
+    last_X = None
+    for _ in range(epochs):
+        for center, X, y, is_test in _split_chunks(partitions, n_train, rng):
+            train = np.flatnonzero(~is_test)
+            if len(train) == 0:
+                continue
+            train = rng.permutation(train)
+            X_scaled = imputer.transform(scaler.transform(X.iloc[train]))
+            model.partial_fit(X_scaled, y.to_numpy()[train])
+            last_X = X
+
+    print("➡ Pass 3: scoring the final model on the holdout...")
+    sse, sum_y, sum_y2, n_test = 0.0, 0.0, 0.0, 0
+    for center, X, y, is_test in _split_chunks(partitions, n_train):
+        if not is_test.any():
+            continue
+        y_test = y.to_numpy()[is_test]
+        pred = model.predict(imputer.transform(scaler.transform(X[is_test])))
+        sse += float(((y_test - pred) ** 2).sum())
+        sum_y += float(y_test.sum())
+        sum_y2 += float((y_test ** 2).sum())
+        n_test += len(y_test)
+
+    if n_test:
+        sst = sum_y2 - sum_y ** 2 / n_test
+        score = 1 - sse / sst if sst else float("nan")
+        print(f"✅ Model trained. R2 score = {score:.3f}")
+
+    pipeline = Pipeline([("impute", imputer), ("sgd", model)])
+    # sanity check: the saved pair must predict a single serving-style row
+    pred = pipeline.predict(scaler.transform(last_X.tail(1)))
+    if not np.isfinite(pred).all():
+        raise RuntimeError("Chunk-trained model produced a non-finite prediction")
+
+    os.makedirs("src/models", exist_ok=True)
+    joblib.dump(pipeline, CHUNKED_MODEL_PATH)
+    joblib.dump(scaler, CHUNKED_SCALER_PATH)
+
+    print("🎉 Model saved successfully!")
+    print(f"   → {CHUNKED_MODEL_PATH}")
+    print(f"   → {CHUNKED_SCALER_PATH}")
+    print("   (serve it with AQI_CHUNKED_MODEL=1; shared mode only applies to the forest)")
 
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the PM2.5 forecasting model.")
+    parser.add_argument("--chunked", action="store_true",
+                        help="stream data/processed_data.csv in chunks and train incrementally")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS,
+                        help="passes over the data in chunked mode")
+    args = parser.parse_args()
+
+    if args.chunked:
+        train_model_chunked(chunksize=args.chunksize, epochs=args.epochs)
+    else:
+        train_model()
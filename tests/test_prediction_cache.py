@@ -0,0 +1,142 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from src import prediction_cache, predictor
+from src.prediction_cache import PredictionCache, feature_hash
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(prediction_cache, "time", fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(ttl=60)
+    cache.put("k", 1.0)
+    clock.now += 59
+    assert cache.get("k") == 1.0
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_at_maxsize(clock):
+    cache = PredictionCache(maxsize=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", 3.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.get("c") == 3.0
+
+
+def test_stats_hit_rate():
+    cache = PredictionCache()
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.put("a", 1.0)
+    for key in ["a", "a", "a", "missing"]:
+        cache.get(key)
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 1}
+
+
+def test_set_version_clears_only_on_change():
+    cache = PredictionCache()
+    cache.set_version("v1")
+    cache.put("a", 1.0)
+    cache.set_version("v1")
+    assert cache.get("a") == 1.0
+    cache.set_version("v2")
+    assert cache.get("a") is None
+
+
+def test_set_version_is_safe_across_threads():
+    cache = PredictionCache()
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        barrier.wait()
+        for _ in range(200):
+            cache.set_version(f"v{i % 2}")
+            cache.put(("k", i), float(i))
+            cache.get(("k", i))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.version in ("v0", "v1")
+
+
+def test_feature_hash_quantizes_below_decimals():
+    X = pd.DataFrame([[100.0, 12.5]], columns=["pm2_5", "pm10"])
+    assert feature_hash(X) == feature_hash(X + 0.0004)
+    assert feature_hash(X) != feature_hash(X + 0.1)
+    assert feature_hash(X) != feature_hash(X.rename(columns={"pm10": "o3"}))
+
+
+@pytest.fixture
+def fake_center(tmp_path, monkeypatch):
+    """predict_for_center wired to local files and a counting fake model."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/history")
+    center = next(iter(predictor.CENTERS))
+    history = f"data/history/{center}.csv"
+    pd.DataFrame({"timestamp": pd.date_range("2025-10-01", periods=30, freq="D"),
+                  "pm2_5": range(30)}).to_csv(history, index=False)
+    model_file = tmp_path / "model.pkl"
+    model_file.write_text("v1")
+
+    rt = pd.DataFrame([{"timestamp": pd.Timestamp("2025-10-31", tz="UTC"), "pm2_5": 50.0}])
+    calls = []
+    monkeypatch.setattr(predictor, "get_realtime_aqi_by_coords", lambda lat, lon: None)
+    monkeypatch.setattr(predictor, "format_for_model", lambda d: rt.copy())
+    monkeypatch.setattr(predictor, "predict_pm2_5", lambda X: calls.append(1) or 42.0)
+    monkeypatch.setattr(predictor, "MODEL_FILES", [str(model_file)])
+    monkeypatch.setattr(predictor, "_cache", PredictionCache())
+    return center, history, model_file, calls
+
+
+def _touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_predictor_serves_repeats_from_cache(fake_center):
+    center, _, _, calls = fake_center
+    for _ in range(5):
+        assert predictor.predict_for_center(center) == 42.0
+    assert len(calls) == 1
+    assert predictor.cache_stats()["hit_rate"] == 0.8
+
+
+def test_new_model_invalidates_cache(fake_center):
+    center, _, model_file, calls = fake_center
+    predictor.predict_for_center(center)
+    model_file.write_text("v2 retrained")
+    _touch(model_file)
+    predictor.predict_for_center(center)
+    assert len(calls) == 2
+    assert predictor.cache_stats()["size"] == 1  # old-version entry dropped
+
+
+def test_history_rewrite_changes_key(fake_center):
+    center, history, _, calls = fake_center
+    predictor.predict_for_center(center)
+    _touch(history)
+    predictor.predict_for_center(center)
+    assert len(calls) == 2
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from src.preprocess import make_realtime_features
+from src import resample
+from src.resample import load_resampled, resample_series
+from src.train_model import holdout_mask
+
+
+def test_resample_series_spans_valid_values_only():
+    idx = pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-04", "2025-01-20", "2025-01-25"])
+    s = pd.Series([1.0, 2.0, 4.0, 20.0, np.nan], index=idx)
+    out = resample_series(s, freq="D", limit=3)
+    assert out.index[-1] == pd.Timestamp("2025-01-20")  # trailing NaN is not a gap
+    assert out["2025-01-03"] == 3.0                     # short gap interpolated
+    assert out["2025-01-05":"2025-01-19"].isna().all()  # long gap left empty
+
+
+def test_realtime_lags_are_looked_up_by_time(caplog):
+    hist = pd.DataFrame({
+        "timestamp": pd.date_range("2025-10-01", periods=10, freq="D"),
+        "pm2_5": np.arange(10.0),
+    })
+    rt = pd.DataFrame([{"timestamp": pd.Timestamp("2025-10-11 14:30", tz="UTC"), "pm2_5": 99.0}])
+    X = make_realtime_features(rt, hist)
+    assert X["pm2_5_lag_1"].iloc[0] == 9.0   # 2025-10-10
+    assert X["pm2_5_lag_3"].iloc[0] == 7.0   # 2025-10-08
+    assert np.isnan(X["pm2_5_lag_12"].iloc[0])  # before the history starts
+
+    assert not caplog.records
+
+
+def test_stale_history_falls_back_to_latest_values(caplog):
+    hist = pd.DataFrame({
+        "timestamp": pd.date_range("2025-10-01", periods=10, freq="D"),
+        "pm2_5": np.arange(10.0),
+    })
+    rt = pd.DataFrame([{"timestamp": pd.Timestamp("2026-01-01 09:00", tz="UTC"), "pm2_5": 99.0}])
+    X = make_realtime_features(rt, hist)
+    assert X["pm2_5_lag_1"].iloc[0] == 9.0  # last history value, not NaN
+    assert X["pm2_5_lag_3"].iloc[0] == 7.0
+    assert np.isnan(X["pm2_5_lag_24"].iloc[0])  # still beyond the history
+    assert "History ends 2025-10-10" in caplog.text
+
+
+def test_holdout_is_most_recent_period_of_each_center():
+    df = pd.DataFrame({
+        "center": ["a"] * 10 + ["b"] * 5,
+        "timestamp": list(pd.date_range("2020-01-01", periods=10)) + list(pd.date_range("2024-01-01", periods=5)),
+    }).sample(frac=1, random_state=0)
+    mask = holdout_mask(df, test_size=0.2)
+    test = df[mask]
+    assert sorted(test["timestamp"].dt.strftime("%Y-%m-%d")) == ["2020-01-09", "2020-01-10", "2024-01-05"]
+
+
+def test_disk_cache_is_per_source_path_and_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(resample, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(resample, "_memo", {})
+    paths = []
+    for sub, value in [("a", 1.0), ("b", 2.0)]:
+        (tmp_path / sub).mkdir()
+        path = tmp_path / sub / "store.csv"  # same basename, different directories
+        pd.DataFrame({"timestamp": ["2025-01-01", "2025-01-02"], "pm2_5": [value] * 2,
+                      "center": ["x"] * 2}).to_csv(path, index=False)
+        paths.append(str(path))
+
+    assert load_resampled(paths[0])["pm2_5"].tolist() == [1.0, 1.0]
+    assert load_resampled(paths[1])["pm2_5"].tolist() == [2.0, 2.0]
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+    monkeypatch.setattr(resample, "_memo", {})
+    monkeypatch.setattr(resample, "RESAMPLE_VERSION", resample.RESAMPLE_VERSION + 1)
+    load_resampled(paths[0])
+    assert len(list((tmp_path / "cache").iterdir())) == 3  # new version, new cache file
@@ -0,0 +1,92 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src import shared_model
+from src.shared_model import SharedForest, benchmark, export_forest
+
+
+def _fit_forest(n_samples, n_estimators, with_nan=False):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_samples, 8))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(size=n_samples)
+    if with_nan:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=0, n_jobs=-1)
+    return model.fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def exported_forest(tmp_path_factory):
+    """Forest big enough (~70 MB unpickled) to dwarf a worker's own footprint."""
+    tmp = tmp_path_factory.mktemp("shared")
+    model = _fit_forest(n_samples=40_000, n_estimators=20)
+    model_path = str(tmp / "model.pkl")
+    joblib.dump(model, model_path)
+    shared_dir = str(tmp / "shared")
+    export_forest(model, out_dir=shared_dir)
+    return model, model_path, shared_dir
+
+
+@pytest.mark.parametrize("with_nan", [False, True])
+def test_shared_forest_matches_sklearn(tmp_path, with_nan):
+    model = _fit_forest(n_samples=2_000, n_estimators=25, with_nan=with_nan)
+    export_forest(model, out_dir=str(tmp_path / "shared"))
+    forest = SharedForest.attach(str(tmp_path / "shared"), model_path=str(tmp_path / "none.pkl"))
+
+    X = np.random.default_rng(1).normal(size=(300, 8)) * 2
+    X[np.random.default_rng(2).random(X.shape) < 0.15] = np.nan
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def test_reexport_keeps_attach_working(tmp_path):
+    shared_dir = str(tmp_path / "shared")
+    missing_model = str(tmp_path / "none.pkl")
+    first = _fit_forest(n_samples=500, n_estimators=3)
+    second = _fit_forest(n_samples=600, n_estimators=4)
+    export_forest(first, out_dir=shared_dir)
+    attached = SharedForest.attach(shared_dir, missing_model)
+    for _ in range(3):
+        export_forest(second, out_dir=shared_dir)
+
+    X = np.random.default_rng(3).normal(size=(5, 8))
+    np.testing.assert_array_equal(attached.predict(X), first.predict(X))
+    np.testing.assert_array_equal(SharedForest.attach(shared_dir, missing_model).predict(X),
+                                  second.predict(X))
+    assert len([d for d in os.listdir(shared_dir) if d.startswith("v")]) == 2
+
+
+def test_export_skips_old_versions_that_cannot_be_removed(tmp_path, monkeypatch, caplog):
+    shared_dir = str(tmp_path / "shared")
+    model = _fit_forest(n_samples=300, n_estimators=2)
+    for _ in range(2):
+        export_forest(model, out_dir=shared_dir)
+
+    def locked(path, *args, **kwargs):  # what Windows does with a mapped file
+        raise PermissionError(f"in use: {path}")
+    monkeypatch.setattr(shared_model.shutil, "rmtree", locked)
+
+    version_dir = export_forest(model, out_dir=shared_dir)
+    assert os.path.basename(version_dir) == open(os.path.join(shared_dir, "CURRENT")).read()
+    assert "Could not remove old shared model" in caplog.text
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"),
+                    reason="needs /proc/<pid>/smaps_rollup (Linux)")
+def test_shared_workers_aggregate_memory(exported_forest):
+    # starts 26 spawned workers; run with --runslow
+    _, model_path, shared_dir = exported_forest
+    results = benchmark((1, 4, 8), model_path=model_path, shared_dir=shared_dir)
+    pss = {key: value[1] for key, value in results.items()}
+
+    private_growth = pss[("private", 8)] - pss[("private", 1)]
+    shared_growth = pss[("shared", 8)] - pss[("shared", 1)]
+    # every private worker holds its own copy; shared workers only add their
+    # interpreter footprint on top of one page-cache copy
+    assert shared_growth < 0.5 * private_growth
+    assert pss[("shared", 8)] < 0.5 * pss[("private", 8)]
+    assert pss[("shared", 4)] < pss[("private", 4)]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from src.model import load_model
+from src.preprocess import FEATURES, make_features, add_target
+from src.resample import resample_frame
+from src.train_model import (train_model_chunked, fit_scaler_streaming, partition_data,
+                             iter_feature_chunks, LAGS, HORIZON)
+
+
+def _write_store(path):
+    rng = np.random.default_rng(0)
+    frames = []
+    for center in ["Center A", "Center B"]:
+        ts = pd.date_range("2019-01-01", "2021-12-31", freq="D")
+        df = pd.DataFrame({"timestamp": ts})
+        df["pm2_5"] = 150 + np.cumsum(rng.normal(0, 5, len(ts)))
+        for col in ["pm10", "o3", "no2", "so2", "co"]:
+            df[col] = rng.uniform(1, 100, len(ts))
+        df["center"] = center
+        frames.append(df)
+    frames[0].loc[frames[0]["timestamp"].dt.year == 2019, "so2"] = np.nan  # one all-NaN partition
+    frames[1]["co"] = np.nan  # never observed for a whole center
+    pd.concat(frames).sample(frac=1, random_state=0).to_csv(path, index=False)
+
+
+def test_streaming_scaler_ignores_all_nan_chunks():
+    a = pd.DataFrame({"x": [1.0, 2.0, 3.0], "y": [np.nan] * 3})
+    b = pd.DataFrame({"x": [4.0, 5.0], "y": [10.0, 20.0]})
+    scaler = fit_scaler_streaming([a, b])
+    assert np.allclose(scaler.mean_, [3.0, 15.0])
+    assert np.allclose(scaler.var_, [2.0, 25.0])
+    assert np.isfinite(scaler.transform(b)).all()
+
+
+def test_chunked_model_predicts_one_row(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_store(tmp_path / "store.csv")
+
+    train_model_chunked(path="store.csv", chunksize=500)
+
+    assert not (tmp_path / "src" / "models" / "model.pkl").exists()
+    model, scaler = load_model(chunked=True)
+    assert np.isfinite(scaler.var_).all()
+
+    row = pd.DataFrame([np.arange(1.0, len(FEATURES) + 1)], columns=FEATURES)
+    assert np.isfinite(model.predict(scaler.transform(row))).all()
+
+    row.loc[0, ["so2", "co"]] = np.nan  # serving imputes like training
+    assert np.isfinite(model.predict(scaler.transform(row))).all()
+
+
+@pytest.mark.parametrize("interleave", [False, True])
+def test_chunked_features_match_whole_frame(tmp_path, interleave):
+    # two centers spanning three year boundaries, shuffled and read in
+    # small chunks so carry-over across partitions is exercised
+    _write_store(tmp_path / "store.csv")
+    partitions = partition_data(str(tmp_path / "store.csv"), out_dir=str(tmp_path / "parts"),
+                                chunksize=137)
+    assert all(len(paths) == 3 for paths in partitions.values())
+    chunks = list(iter_feature_chunks(partitions, interleave=interleave))
+    X = pd.concat([c[1] for c in chunks])
+    y = pd.concat([c[2] for c in chunks])
+
+    whole = resample_frame(pd.read_csv(tmp_path / "store.csv"))
+    whole = make_features(whole, lags=LAGS, freq="D")
+    whole = add_target(whole, horizon=HORIZON, freq="D")
+    whole = whole[~whole["gap"]]
+
+    key = lambda X, y: X.assign(y=y.to_numpy()).sort_values(list(X.columns) + ["y"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(key(X, y), key(whole[FEATURES].astype(float), whole["pm2_5_future"]),
+                                  check_dtype=False)
+    # rows straddling the new year (lags reach back into the previous partition)
+    assert (whole["timestamp"] == pd.Timestamp("2020-01-05")).sum() == 2